@@ -0,0 +1,141 @@
+"""Benchmarks, run in-process (needs httpx).
+
+overload: bursts of concurrent requests across the route classes, with
+ADMISSION off and on, against plain FastAPI (FAST_PATH=0) and against the fast
+path (FAST_PATH=1). Each run imports main in a fresh process
+so the app is wired exactly as in production. In-process requests never block
+on a socket, so every response start is delayed by service_ms to make admitted
+requests hold their slot the way a slow client or network would.
+routes: requests per second for each funnel route through the bare FastAPI app
+(no admission middleware) and through the ASGI fast path.
+
+    python bench.py overload [concurrency] [rounds] [service_ms]
+    python bench.py routes [requests] [concurrency]
+"""
+import os
+import sys
+import time
+import asyncio
+import subprocess
+import httpx
+
+MODE = sys.argv[1] if len(sys.argv) > 1 else "overload"
+if MODE == "routes":
+    # compare against the bare FastAPI app, without the admission middleware
+    os.environ["ADMISSION"] = "0"
+import main
+
+SLUG, R, K, U = "bench1", "rrrrrr", "kkkkkk", "uuuuuu"
+
+FUNNEL_ROUTES = {
+    "entrance": f"/{SLUG}",
+    "step2": f"/r/{R}/{SLUG}",
+    "step3": f"/k/{K}/r/{R}/{SLUG}",
+    "final": f"/u/{U}/k/{K}/r/{R}/{SLUG}",
+}
+
+ROUTES = {
+    "page": ("GET", f"/{SLUG}"),
+    "final": ("GET", f"/u/{U}/k/{K}/r/{R}/{SLUG}"),
+    "webhook": ("POST", "/webhook"),
+    "health": ("GET", "/health"),
+}
+# rough production mix: mostly page renders
+MIX = ["page"] * 6 + ["final"] * 2 + ["webhook"] + ["health"]
+WEBHOOK_BODY = {"message": {"chat": {"id": 1}, "from": {"id": main.OWNER_ID}, "text": "ping"}}
+
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def hit(client, name, results):
+    method, path = ROUTES[name]
+    start = time.perf_counter()
+    if method == "POST":
+        resp = await client.post(path, json=WEBHOOK_BODY)
+    else:
+        resp = await client.get(path)
+    results.append((name, resp.status_code, time.perf_counter() - start))
+
+
+def slow_send(app, delay):
+    async def wrapped(scope, receive, send):
+        async def send_delayed(message):
+            if message["type"] == "http.response.start":
+                await asyncio.sleep(delay)
+            await send(message)
+        await app(scope, receive, send_delayed)
+    return wrapped
+
+
+async def run(concurrency, rounds, service_ms):
+    results = []
+    transport = httpx.ASGITransport(app=slow_send(main.asgi, service_ms / 1000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(
+                hit(client, MIX[i % len(MIX)], results) for i in range(concurrency)
+            ))
+        elapsed = time.perf_counter() - start
+
+    print(f"\nFAST_PATH={'on' if main.FAST_PATH else 'off'}  "
+          f"ADMISSION={'on' if main.ADMISSION else 'off'}  "
+          f"{len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.0f} req/s)")
+    print(f"{'class':<8} {'ok':>6} {'503':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for name in main.PRIORITY:
+        ok = [t for n, code, t in results if n == name and code != 503]
+        shed = sum(1 for n, code, _ in results if n == name and code == 503)
+        print(f"{name:<8} {len(ok):>6} {shed:>6} "
+              f"{pct(ok, 0.5) * 1000:>8.1f} {pct(ok, 0.99) * 1000:>8.1f}")
+
+
+async def rps(app, path, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(n):
+            for _ in range(n):
+                resp = await client.get(path)
+                assert resp.status_code in (200, 302), resp.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        return requests // concurrency * concurrency / (time.perf_counter() - start)
+
+
+def routes(requests, concurrency):
+    fast = main.FastPath(main.app)
+    print(f"{'route':<10} {'fastapi':>10} {'fast path':>10} {'speedup':>8}")
+    for name, path in FUNNEL_ROUTES.items():
+        before = asyncio.run(rps(main.app, path, requests, concurrency))
+        after = asyncio.run(rps(fast, path, requests, concurrency))
+        print(f"{name:<10} {before:>10.0f} {after:>10.0f} {after / before:>7.1f}x")
+
+
+def bench():
+    args = [int(a) for a in sys.argv[2:]]
+    main.funnels[SLUG] = (R, K, U, "https://example.com")
+    if MODE == "routes":
+        routes(*(args or [5000, 50]))
+        return
+    if MODE == "overload-run":
+        asyncio.run(run(*args))
+        return
+    concurrency = args[0] if len(args) > 0 else 2000
+    rounds = args[1] if len(args) > 1 else 3
+    service_ms = args[2] if len(args) > 2 else 5
+    for fast_path in ("0", "1"):
+        for enabled in ("0", "1"):
+            subprocess.run(
+                [sys.executable, __file__, "overload-run", str(concurrency), str(rounds), str(service_ms)],
+                env=dict(os.environ, ADMISSION=enabled, FAST_PATH=fast_path),
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    bench()
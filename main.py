@@ -5,8 +5,9 @@ import asyncio
 import urllib.parse
 import urllib.request
 import json
+from collections import deque
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
 
 app = FastAPI()
 
@@ -18,6 +19,28 @@ BASE_URL = os.getenv("BASE_URL", "").rstrip("/")
 
 TXT_FILE = "database.txt"
 
+# Admission control: max concurrent requests / max queued requests per route class.
+# Set ADMISSION=0 to disable.
+ADMISSION = os.getenv("ADMISSION", "1") != "0"
+ROUTE_LIMITS = {
+    "final": int(os.getenv("LIMIT_FINAL", "32")),
+    "webhook": int(os.getenv("LIMIT_WEBHOOK", "8")),
+    "page": int(os.getenv("LIMIT_PAGE", "32")),
+    "health": int(os.getenv("LIMIT_HEALTH", "4")),
+}
+ROUTE_QUEUES = {
+    "final": int(os.getenv("QUEUE_FINAL", "256")),
+    "webhook": int(os.getenv("QUEUE_WEBHOOK", "64")),
+    "page": int(os.getenv("QUEUE_PAGE", "128")),
+    "health": int(os.getenv("QUEUE_HEALTH", "8")),
+}
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", "48"))  # shared by final/webhook/page
+QUEUE_DEADLINE = float(os.getenv("QUEUE_DEADLINE", "2.0"))  # seconds
+RETRY_AFTER = os.getenv("RETRY_AFTER", "1")
+
+# Raw ASGI fast path for the funnel routes in front of FastAPI. Set FAST_PATH=0 to disable.
+FAST_PATH = os.getenv("FAST_PATH", "1") != "0"
+
 funnels = {}
 lock = asyncio.Lock()
 
@@ -91,10 +114,137 @@ async def self_ping():
 async def startup_event():
     asyncio.create_task(self_ping())
 
+# ================= ADMISSION =================
+# Highest priority first. Freed slots go to queued final redirects and webhooks
+# before page renders. Health has its own slots outside MAX_INFLIGHT so it keeps
+# answering while the funnel routes are saturated.
+PRIORITY = ("final", "webhook", "page", "health")
+
+class Admission:
+    def __init__(self, limits, queues, max_inflight, deadline):
+        self.limits = limits
+        self.queues = queues
+        self.max_inflight = max_inflight
+        self.deadline = deadline
+        self.active = {name: 0 for name in limits}
+        self.waiters = {name: deque() for name in limits}
+        self.inflight = 0
+        self.admitted = {name: 0 for name in limits}
+        self.shed = {name: 0 for name in limits}
+
+    def _shared(self, name):
+        return name != "health"
+
+    def _can_run(self, name):
+        if self.active[name] >= self.limits[name]:
+            return False
+        return not self._shared(name) or self.inflight < self.max_inflight
+
+    def _grant(self, name):
+        self.active[name] += 1
+        if self._shared(name):
+            self.inflight += 1
+        self.admitted[name] += 1
+
+    def _wake(self):
+        for name in PRIORITY:
+            queue = self.waiters[name]
+            while queue and self._can_run(name):
+                self._grant(name)
+                queue.popleft().set_result(None)
+
+    async def acquire(self, name):
+        # Returns False when the request is shed
+        if not self.waiters[name] and self._can_run(name):
+            self._grant(name)
+            return True
+
+        if len(self.waiters[name]) >= self.queues[name]:
+            self.shed[name] += 1
+            return False
+
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters[name].append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.deadline)
+            return True
+        except asyncio.TimeoutError:
+            if fut.done():
+                # granted right as the deadline hit
+                return True
+            self._drop(name, fut)
+            self.shed[name] += 1
+            return False
+        except asyncio.CancelledError:
+            if fut.done():
+                self.release(name)
+            else:
+                self._drop(name, fut)
+            raise
+
+    def _drop(self, name, fut):
+        fut.cancel()
+        try:
+            self.waiters[name].remove(fut)
+        except ValueError:
+            pass
+
+    def release(self, name):
+        self.active[name] -= 1
+        if self._shared(name):
+            self.inflight -= 1
+        self._wake()
+
+    def stats(self):
+        return {
+            name: {
+                "active": self.active[name],
+                "queued": len(self.waiters[name]),
+                "admitted": self.admitted[name],
+                "shed": self.shed[name],
+            }
+            for name in PRIORITY
+        }
+
+admission = Admission(ROUTE_LIMITS, ROUTE_QUEUES, MAX_INFLIGHT, QUEUE_DEADLINE)
+
+def route_class(path):
+    if path == "/health":
+        return "health"
+    if path == "/webhook":
+        return "webhook"
+    if path.startswith("/u/"):
+        return "final"
+    return "page"
+
+class AdmissionControl:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        name = route_class(scope["path"])
+        if not await admission.acquire(name):
+            response = PlainTextResponse(
+                "Service Unavailable",
+                status_code=503,
+                headers={"Retry-After": RETRY_AFTER, "Cache-Control": "no-store"}
+            )
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(name)
+
+if ADMISSION:
+    app.add_middleware(AdmissionControl)
+
 # ================= HEALTH =================
 @app.get("/health")
 async def health():
-    return {"status": "alive"}
+    return {"status": "alive", "admission": admission.stats()}
 
 # ================= WEBHOOK =================
 @app.post("/webhook")
@@ -148,14 +298,7 @@ Final Redirect:
     return {"ok": True}
 
 # ================= STEP 1 =================
-@app.get("/{slug}", response_class=HTMLResponse)
-async def entrance(slug: str):
-    funnel = await get_funnel(slug)
-    if not funnel:
-        return HTMLResponse("Not Found", status_code=404)
-
-    r_code = funnel[0]
-
+def entrance_page(slug, r_code):
     return f"""
         <html lang="en">
 <head>
@@ -339,15 +482,18 @@ Smart investors don’t rely on luck — they rely on strategy, risk management,
 </html>
     """
 
-# ================= STEP 2 =================
-@app.get("/r/{r_code}/{slug}", response_class=HTMLResponse)
-async def step2(r_code: str, slug: str):
+@app.get("/{slug}", response_class=HTMLResponse)
+async def entrance(slug: str):
     funnel = await get_funnel(slug)
-    if not funnel or funnel[0] != r_code:
-        return HTMLResponse("Invalid", status_code=403)
+    if not funnel:
+        return HTMLResponse("Not Found", status_code=404)
 
-    k_code = funnel[1]
+    r_code = funnel[0]
+
+    return entrance_page(slug, r_code)
 
+# ================= STEP 2 =================
+def step2_page(slug, r_code, k_code):
     return f"""
           <!DOCTYPE html>
 <html lang="en">
@@ -515,15 +661,18 @@ Thousands of adults join private networks daily seeking exciting conversations a
 </html>
     """
 
-# ================= STEP 3 =================
-@app.get("/k/{k_code}/r/{r_code}/{slug}", response_class=HTMLResponse)
-async def step3(k_code: str, r_code: str, slug: str):
+@app.get("/r/{r_code}/{slug}", response_class=HTMLResponse)
+async def step2(r_code: str, slug: str):
     funnel = await get_funnel(slug)
-    if not funnel or funnel[0] != r_code or funnel[1] != k_code:
+    if not funnel or funnel[0] != r_code:
         return HTMLResponse("Invalid", status_code=403)
 
-    u_code = funnel[2]
+    k_code = funnel[1]
 
+    return step2_page(slug, r_code, k_code)
+
+# ================= STEP 3 =================
+def step3_page(slug, r_code, k_code, u_code):
     return f"""
         <!DOCTYPE html>
 <html lang="en">
@@ -677,6 +826,16 @@ function checkUnlock() {{
 </html>
 """
 
+@app.get("/k/{k_code}/r/{r_code}/{slug}", response_class=HTMLResponse)
+async def step3(k_code: str, r_code: str, slug: str):
+    funnel = await get_funnel(slug)
+    if not funnel or funnel[0] != r_code or funnel[1] != k_code:
+        return HTMLResponse("Invalid", status_code=403)
+
+    u_code = funnel[2]
+
+    return step3_page(slug, r_code, k_code, u_code)
+
 # ================= FINAL =================
 @app.get("/u/{u_code}/k/{k_code}/r/{r_code}/{slug}")
 async def final(u_code: str, k_code: str, r_code: str, slug: str):
@@ -693,4 +852,126 @@ async def final(u_code: str, k_code: str, r_code: str, slug: str):
             headers={"Cache-Control": "no-cache"}
         )
 
-    return HTMLResponse("Invalid", status_code=403)
\ No newline at end of file
+    return HTMLResponse("Invalid", status_code=403)
+
+# ================= FAST PATH =================
+# Serves the four funnel routes straight from ASGI, skipping FastAPI routing,
+# validation and response classes. Anything that is not a GET with 6-char
+# alphanumeric segments falls through to FastAPI unchanged.
+CODE_CHARS = frozenset(string.ascii_letters + string.digits)
+
+def encoded(status, headers, body):
+    return status, headers + [(b"content-length", str(len(body)).encode())], body
+
+HTML_HEADERS = [(b"content-type", b"text/html; charset=utf-8")]
+NOT_FOUND = encoded(404, HTML_HEADERS, b"Not Found")
+INVALID = encoded(403, HTML_HEADERS, b"Invalid")
+SHED = encoded(503, [
+    (b"content-type", b"text/plain; charset=utf-8"),
+    (b"retry-after", RETRY_AFTER.encode()),
+    (b"cache-control", b"no-store"),
+], b"Service Unavailable")
+
+# Funnels never change once created, so encoded responses are cached per (step, slug)
+page_cache = {}
+
+def is_code(segment):
+    return len(segment) == 6 and CODE_CHARS.issuperset(segment)
+
+def cached_page(step, slug, render, *args):
+    key = (step, slug)
+    response = page_cache.get(key)
+    if response is None:
+        response = page_cache[key] = encoded(200, HTML_HEADERS, render(*args).encode())
+    return response
+
+def fast_response(parts):
+    # funnels is only mutated synchronously inside save_funnel, so a plain read
+    # is safe here without taking the lock
+    slug = parts[-1]
+    funnel = funnels.get(slug)
+
+    if len(parts) == 1:
+        if not funnel:
+            return NOT_FOUND
+        return cached_page(1, slug, entrance_page, slug, funnel[0])
+
+    if not funnel:
+        return INVALID
+    r_saved, k_saved, u_saved, target = funnel
+
+    if len(parts) == 3:
+        # /r/{r}/{slug}
+        if parts[1] != r_saved:
+            return INVALID
+        return cached_page(2, slug, step2_page, slug, r_saved, k_saved)
+
+    if len(parts) == 5:
+        # /k/{k}/r/{r}/{slug}
+        if parts[3] != r_saved or parts[1] != k_saved:
+            return INVALID
+        return cached_page(3, slug, step3_page, slug, r_saved, k_saved, u_saved)
+
+    # /u/{u}/k/{k}/r/{r}/{slug}
+    if parts[5] != r_saved or parts[3] != k_saved or parts[1] != u_saved:
+        return INVALID
+    location = urllib.parse.quote(target, safe=":/%#?=@[]!$&'()*+,;")
+    return encoded(302, [
+        (b"location", location.encode("latin-1")),
+        (b"cache-control", b"no-cache"),
+    ], b"")
+
+ROUTE_MARKERS = ("u", "k", "r")
+
+def match_funnel_path(path, static_paths):
+    # Returns the path segments of a funnel route, or None to fall through
+    if path in static_paths:
+        return None
+    parts = path[1:].split("/")
+    if len(parts) % 2 == 0 or len(parts) > 7:
+        return None
+    markers = ROUTE_MARKERS[3 - len(parts) // 2:]
+    for i, marker in enumerate(markers):
+        if parts[i * 2] != marker or not is_code(parts[i * 2 + 1]):
+            return None
+    if not is_code(parts[-1]):
+        return None
+    return parts
+
+class FastPath:
+    def __init__(self, app):
+        self.app = app
+        self.static_paths = {
+            route.path for route in app.routes
+            if "{" not in getattr(route, "path", "{")
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        parts = match_funnel_path(scope["path"], self.static_paths)
+        if parts is None:
+            return await self.app(scope, receive, send)
+
+        if not ADMISSION:
+            return await self.respond(send, fast_response(parts))
+
+        name = route_class(scope["path"])
+        if not await admission.acquire(name):
+            return await self.respond(send, SHED)
+        try:
+            await self.respond(send, fast_response(parts))
+        finally:
+            admission.release(name)
+
+    async def respond(self, send, response):
+        status, headers, body = response
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": body})
+
+asgi = FastPath(app) if FAST_PATH else app